@@ -0,0 +1,166 @@
+"""
+autotune.py - hardware autotuner for the summarizer service
+
+Run on the target machine (from the python-ai-service folder):
+
+    python -m app.autotune
+    python -m app.autotune --samples 32 --batch-sizes 1 2 4
+
+Sweeps torch intra-op / inter-op threads, worker processes and batch size
+against notes from data/train.jsonl, using the real summarize path in
+app/medical_summarizer.py. Picks a throughput-optimal and a latency-optimal
+config and writes both to config/runtime.json, which the service loads at
+startup (see app/runtime_config.py and app/serve.py).
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+DATA_FILE = Path("data/train.jsonl")
+OUTPUT_FILE = Path("config/runtime.json")
+
+# Set inside each worker process by _init_worker
+_summarizer = None
+
+
+def load_corpus(path: Path, samples: int) -> list:
+    """Read the first `samples` note inputs from a JSONL file."""
+    texts = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            texts.append(json.loads(line)["input"])
+            if len(texts) >= samples:
+                break
+    return texts
+
+
+def _init_worker(intra_op_threads, inter_op_threads, warmup_text, ready):
+    global _summarizer
+    # Ignore any existing config so the trial settings are the ones measured
+    os.environ["UZIMA_RUNTIME_CONFIG"] = ""
+
+    from app.runtime_config import apply_torch_threads
+    apply_torch_threads(intra_op_threads, inter_op_threads)
+
+    from app import medical_summarizer
+    _summarizer = medical_summarizer
+    _summarizer.summarize_text(warmup_text)
+
+    # No worker takes a timed batch until every worker has loaded and warmed up
+    ready.wait()
+
+
+def _run_batch(batch):
+    start = time.perf_counter()
+    _summarizer.summarize_batch(batch)
+    return time.perf_counter() - start
+
+
+def run_trial(texts, workers, intra_op_threads, inter_op_threads, batch_size):
+    """
+    Time one config. Model loading and warm-up are excluded; every request in
+    a batch is charged the full batch time as its latency.
+    """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    ctx = mp.get_context("spawn")  # fresh torch per worker, threads not inherited
+    ready = ctx.Barrier(workers + 1)  # every worker, plus this process
+
+    with ctx.Pool(
+        processes=workers,
+        initializer=_init_worker,
+        initargs=(intra_op_threads, inter_op_threads, texts[0], ready)
+    ) as pool:
+        ready.wait()
+
+        start = time.perf_counter()
+        latencies = pool.map(_run_batch, batches, chunksize=1)
+        wall = time.perf_counter() - start
+
+    latencies = sorted(latencies)
+    p95_index = max(0, int(round(0.95 * len(latencies))) - 1)
+    return {
+        "workers": workers,
+        "intra_op_threads": intra_op_threads,
+        "inter_op_threads": inter_op_threads,
+        "batch_size": batch_size,
+        "notes_per_sec": round(len(texts) / wall, 3),
+        "latency_p50_s": round(statistics.median(latencies), 4),
+        "latency_p95_s": round(latencies[p95_index], 4),
+    }
+
+
+def candidate_configs(cpu_count, threads, interop, workers, batch_sizes):
+    """All combinations that do not oversubscribe the machine."""
+    for w, t, i, b in itertools.product(workers, threads, interop, batch_sizes):
+        if w * t <= cpu_count:
+            yield w, t, i, b
+
+
+def _profile(trial):
+    keys = ["workers", "intra_op_threads", "inter_op_threads", "batch_size"]
+    return {key: trial[key] for key in keys}
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_threads = sorted({1, 2, 4, cpu_count // 2 or 1, cpu_count})
+
+    parser = argparse.ArgumentParser(description="Autotune torch threads, workers and batch size")
+    parser.add_argument("--data", type=Path, default=DATA_FILE)
+    parser.add_argument("--output", type=Path, default=OUTPUT_FILE)
+    parser.add_argument("--samples", type=int, default=24, help="notes per trial")
+    parser.add_argument("--threads", type=int, nargs="+", default=default_threads)
+    parser.add_argument("--interop", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, cpu_count}))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    texts = load_corpus(args.data, args.samples)
+    if not texts:
+        raise SystemExit(f"No notes found in {args.data}")
+
+    configs = list(candidate_configs(cpu_count, args.threads, args.interop, args.workers, args.batch_sizes))
+    print(f"=== Autotune: {len(configs)} configs x {len(texts)} notes on {cpu_count} CPUs ===\n")
+
+    trials = []
+    for workers, threads, interop, batch_size in configs:
+        trial = run_trial(texts, workers, threads, interop, batch_size)
+        trials.append(trial)
+        print(
+            f"workers={workers} threads={threads} interop={interop} batch={batch_size} -> "
+            f"{trial['notes_per_sec']} notes/s, p50 {trial['latency_p50_s']}s, p95 {trial['latency_p95_s']}s"
+        )
+
+    best_throughput = max(trials, key=lambda t: t["notes_per_sec"])
+    best_latency = min(trials, key=lambda t: (t["latency_p95_s"], -t["notes_per_sec"]))
+
+    import torch
+    config = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "machine": {"cpu_count": cpu_count, "torch_version": torch.__version__},
+        "default_profile": "latency",
+        "throughput": _profile(best_throughput),
+        "latency": _profile(best_latency),
+        "trials": trials,
+    }
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    print(f"\nThroughput-optimal: {config['throughput']}")
+    print(f"Latency-optimal:    {config['latency']}")
+    print(f"Saved to: {args.output.absolute()}")
+
+
+if __name__ == "__main__":
+    main()
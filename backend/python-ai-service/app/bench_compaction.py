@@ -0,0 +1,229 @@
+"""
+bench_compaction.py - benchmark input compaction (app/compaction.py)
+
+    python -m app.bench_compaction
+    python -m app.bench_compaction --samples 20 --no-model   # tokens only, fast
+
+Three note sets:
+  - train:       the short notes in data/train.jsonl
+  - synthetic:   long notes built from train notes the way exported records
+                 look (one sentence per line, verbose labels and units,
+                 whitespace runs, text pasted twice into a section,
+                 confidentiality/page/print boilerplate)
+  - adversarial: short notes that look redundant but are not (content after
+                 a blank line, the same sentence under different headers,
+                 repeated readings, clinical lines that resemble boilerplate
+                 or units, values that look like headers)
+
+For each set reports tokens before/after, compaction time, and the
+summarize_text latency on raw vs compacted input. Also checks the compacted
+note against expected text that does not go through the compaction rules:
+the train note itself, the source notes of a synthetic note, or the
+hand-written expectation of an adversarial note. Every expected line must be
+in the compacted note, in the same order, so content that is dropped,
+rewritten or moved under another header counts as lost. Writes
+reports/compaction_benchmark.json.
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import time
+from pathlib import Path
+
+from app.compaction import compact_note
+
+DATA_FILE = Path("data/train.jsonl")
+OUTPUT_FILE = Path("reports/compaction_benchmark.json")
+
+BOILERPLATE_HEADER = [
+    "CONFIDENTIAL: this record is intended only for the addressee. Unauthorised disclosure is prohibited.",
+    "==============================================",
+]
+BOILERPLATE_FOOTER = [
+    "----------------------------------------------",
+    "Page 1 of 1",
+    "Printed on 2025-03-10 08:14 by records system",
+    "*** END OF REPORT ***",
+]
+# (note, expected compacted note), the expectation written by hand
+ADVERSARIAL = [
+    ("Patient Name: John\n\nAllergies:\n\nPenicillin\n\nMedications:\n\nAmoxicillin 500 milligrams TDS",
+     "Patient Name: John\nAllergies:\nPenicillin\nMedications:\nAmoxicillin 500mg TDS"),
+    ("Inpatient medications:\nContinue metformin 500mg twice daily with meals.\n\n"
+     "Discharge medications:\nContinue metformin 500mg twice daily with meals.",
+     "Inpatient medications:\nContinue metformin 500mg twice daily with meals.\n"
+     "Discharge medications:\nContinue metformin 500mg twice daily with meals."),
+    ("Vitals (08:00):\nBlood Pressure 150/90 mm Hg, Heart Rate 102 beats per minute\n"
+     "Vitals:\nBlood Pressure 150/90 mm Hg, Heart Rate 102 beats per minute",
+     "Vitals (08:00):\nBP 150/90 mmHg, HR 102 bpm\nVitals:\nBP 150/90 mmHg, HR 102 bpm"),
+    ("Vitals:\nBP 120/80\nVitals:\nBP 120/80",
+     "Vitals:\nBP 120/80\nVitals:\nBP 120/80"),
+    ("Confidential: patient does not want disclosure to employer\nPlan: review in 1 week",
+     "Confidential: patient does not want disclosure to employer\nPlan: review in 1 week"),
+    ("Exported on request of patient, HIV status disclosed to spouse\nPlan: counselling",
+     "Exported on request of patient, HIV status disclosed to spouse\nPlan: counselling"),
+    ("Medications:\nParacetamol 1 gram\nParacetamol 1 gram\nPlan:\n\nRepeat dose at 1 am",
+     "Medications:\nParacetamol 1g\nParacetamol 1g\nPlan:\nRepeat dose at 1 am"),
+    ("Page 1 of 1 noted on ward round.\nContinued on IV fluids.\nEnd of report discussed with family.",
+     "Page 1 of 1 noted on ward round.\nContinued on IV fluids.\nEnd of report discussed with family."),
+    ("Sputum culture grew 2 gram-positive cocci.\nBlood culture x2 gram negative rods.\nGram stain: 2 gram stain repeated.",
+     "Sputum culture grew 2 gram-positive cocci.\nBlood culture x2 gram negative rods.\nGram stain: 2 gram stain repeated."),
+    ("Plan:\nContinued",
+     "Plan:\nContinued"),
+    ("Allergies:\nNone known:",
+     "Allergies:\nNone known:"),
+    ("Diet:\nOral fluids at room temperature.\nTemperature 38.2 degrees C",
+     "Diet:\nOral fluids at room temperature.\nTemp 38.2°C"),
+    ("Plan: rest\nPage 1 of 2\n(Continued)\nReview in 2 weeks",
+     "Plan: rest\nReview in 2 weeks"),
+]
+VERBOSE = [
+    (r'\bBP (\d+/\d+)', r'Blood Pressure  \1 mm Hg'),
+    (r'\bHb (\d+(?:\.\d+)?) g/dL', r'Hb \1 grams/dL'),
+    (r'(\d+)\s*mg\b', r'\1 milligrams'),
+    (r'(\d+)g\b', r'\1 grams'),
+]
+
+
+def load_notes(path: Path, samples: int) -> list:
+    with path.open("r", encoding="utf-8") as f:
+        notes = [json.loads(line)["input"] for line in f if line.strip()]
+    return notes[:samples]
+
+
+def make_long_note(notes: list, rng: random.Random) -> tuple:
+    """
+    One long, messy export assembled from several short notes, and the
+    expected content: the source notes as written, one sentence per line.
+    """
+    body, expected = [], []
+    for note in rng.sample(notes, min(4, len(notes))):
+        expected.extend(["Clinical Details:"] + re.split(r'(?<=\.)\s+', note))
+        for pattern, verbose in VERBOSE:
+            note = re.sub(pattern, verbose, note)
+        # One sentence per line under a template header, pasted twice into it
+        fields = [f"   {field}   " for field in re.split(r'(?<=\.)\s+', note)]
+        body.extend(["Clinical Details:"] + fields + [""] + fields + ["", ""])
+    return "\n".join(BOILERPLATE_HEADER + body + BOILERPLATE_FOOTER), "\n".join(expected)
+
+
+def _words(text: str) -> list:
+    # Numbers and words apart, so "500mg" and "500 mg" compare equal
+    return re.findall(r'\d+(?:[./]\d+)*|[^\W\d_]+|[%°]', text.lower())
+
+
+def _in_order(needle: list, words: list) -> bool:
+    remaining = iter(words)
+    return all(word in remaining for word in needle)
+
+
+def missing_lines(expected: str, compacted: str) -> list:
+    """
+    Lines of `expected` not found in `compacted`. Each expected line must be
+    in its own compacted line (words in order; added units are allowed), and
+    the lines must come in the same order.
+    """
+    lines = [_words(line) for line in compacted.split("\n")]
+    missing, position = [], 0
+    for line in expected.split("\n"):
+        words = _words(line)
+        if not words:
+            continue
+        match = next((i for i in range(position, len(lines)) if _in_order(words, lines[i])), None)
+        if match is None:
+            missing.append(line)
+        else:
+            position = match + 1
+    return missing
+
+
+def bench(name: str, notes: list, tokenizer, summarize):
+    """notes is a list of (note, expected content) pairs."""
+    tokens_before, tokens_after, compact_ms, lost, lost_lines = [], [], [], 0, []
+    raw_latency, compact_latency = [], []
+
+    for note, expected in notes:
+        start = time.perf_counter()
+        compacted = compact_note(note)
+        compact_ms.append((time.perf_counter() - start) * 1000)
+        missing = missing_lines(expected, compacted)
+        if missing:
+            lost += 1
+            lost_lines.extend(missing)
+
+        if tokenizer:
+            tokens_before.append(len(tokenizer(note)["input_ids"]))
+            tokens_after.append(len(tokenizer(compacted)["input_ids"]))
+        else:
+            # Rough whitespace-token proxy when running with --no-model
+            tokens_before.append(len(note.split()))
+            tokens_after.append(len(compacted.split()))
+
+        if summarize:
+            start = time.perf_counter()
+            summarize(note)
+            raw_latency.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            summarize(compacted)
+            compact_latency.append(time.perf_counter() - start)
+
+    result = {
+        "set": name,
+        "notes": len(notes),
+        "tokens_before_mean": round(statistics.mean(tokens_before), 1),
+        "tokens_after_mean": round(statistics.mean(tokens_after), 1),
+        "tokens_saved_pct": round(100 * (1 - sum(tokens_after) / sum(tokens_before)), 1),
+        "compaction_ms_mean": round(statistics.mean(compact_ms), 3),
+        "notes_with_lost_content": lost,
+        "lost_lines_sample": lost_lines[:5],
+    }
+    if summarize:
+        result.update({
+            "latency_raw_s": round(statistics.mean(raw_latency), 4),
+            "latency_compacted_s": round(statistics.mean(compact_latency), 4),
+            "latency_reduction_pct": round(100 * (1 - sum(compact_latency) / sum(raw_latency)), 1),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark input compaction")
+    parser.add_argument("--data", type=Path, default=DATA_FILE)
+    parser.add_argument("--output", type=Path, default=OUTPUT_FILE)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-model", action="store_true", help="skip tokenizer and latency measurements")
+    args = parser.parse_args()
+
+    notes = load_notes(args.data, args.samples)
+    rng = random.Random(args.seed)
+    long_notes = [make_long_note(notes, rng) for _ in range(len(notes))]
+    train_notes = [(note, note) for note in notes]
+
+    tokenizer = summarize = None
+    if not args.no_model:
+        from app.medical_summarizer import summarize_text, tokenizer
+        summarize = summarize_text
+        summarize(notes[0])  # warm-up
+
+    print("=== Compaction benchmark ===\n")
+    results = []
+    for name, note_set in [("train", train_notes), ("synthetic_long", long_notes), ("adversarial", ADVERSARIAL)]:
+        result = bench(name, note_set, tokenizer, summarize)
+        results.append(result)
+        print(json.dumps(result, indent=2))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved to: {args.output.absolute()}")
+
+    if any(r["notes_with_lost_content"] for r in results):
+        raise SystemExit("Compaction lost or relabelled clinical content - check app/compaction.py rules")
+
+
+if __name__ == "__main__":
+    main()
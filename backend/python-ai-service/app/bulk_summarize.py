@@ -0,0 +1,237 @@
+"""
+bulk_summarize.py - offline multi-process bulk summarization with resume
+
+    python -m app.bulk_summarize exports/notes.jsonl results/notes_summaries.jsonl
+    python -m app.bulk_summarize exports/notes.csv results/out.jsonl --text-field note --id-field record_id --workers 4
+
+- Streams JSONL or CSV input (never loaded fully into memory)
+- Shards chunks across a process pool: one model per process, torch threads
+  pinned per worker and each worker bound to its own CPU cores
+- Writes results incrementally as JSONL ({"id", "summary"} or {"id", "error"})
+- Checkpoints after every chunk (<output>.checkpoint.json); re-running the same
+  command resumes after the last committed chunk. If a worker process dies
+  (e.g. out of memory) the run stops with an error instead of hanging.
+- Reports notes/sec per worker
+
+Workers, threads and chunk size default to the "throughput" profile written
+by `python -m app.autotune`, when config/runtime.json exists.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+# Nothing from app.* at module level: spawned workers re-import this module,
+# and app.runtime_config reads config/runtime.json as soon as it is imported
+
+# Set inside each worker process by _init_worker
+_summarizer = None
+_lengths = (120, 30)
+
+
+# ────────────────────────────────────────────────
+# Input
+# ────────────────────────────────────────────────
+def read_records(path: Path, text_field: str, id_field: str):
+    """Yield (id, text) one row at a time from a .jsonl or .csv file."""
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows):
+            yield row.get(id_field, index) if id_field else index, row.get(text_field) or ""
+
+
+def chunked(records, size: int, skip: int):
+    """Group records into lists of `size`, after skipping `skip` already-done rows."""
+    chunk = []
+    for index, record in enumerate(records):
+        if index < skip:
+            continue
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ────────────────────────────────────────────────
+# Checkpoint
+# ────────────────────────────────────────────────
+def load_checkpoint(path: Path, input_path: Path) -> dict:
+    if not path.exists():
+        return {"input": str(input_path), "rows_done": 0, "output_bytes": 0}
+    with path.open("r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint["input"] != str(input_path):
+        raise SystemExit(f"Checkpoint {path} belongs to {checkpoint['input']}, not {input_path}")
+    return checkpoint
+
+
+def save_checkpoint(path: Path, checkpoint: dict):
+    # Write-then-rename so a kill mid-write never leaves a broken checkpoint
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# ────────────────────────────────────────────────
+# Workers
+# ────────────────────────────────────────────────
+def _init_worker(threads, core_queue, max_len, min_len):
+    global _summarizer, _lengths
+    try:
+        cores = core_queue.get(timeout=5)
+    except queue.Empty:
+        cores = None  # no core set left - run unpinned
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    # The CLI decides threads per worker, not config/runtime.json. Must be
+    # set before app.runtime_config is first imported in this process
+    os.environ["UZIMA_RUNTIME_CONFIG"] = ""
+    from app.runtime_config import apply_torch_threads
+    apply_torch_threads(threads, 1)
+
+    from app import medical_summarizer
+    _summarizer = medical_summarizer
+    _lengths = (max_len, min_len)
+
+
+def _summarize_chunk(chunk):
+    start = time.perf_counter()
+    max_len, min_len = _lengths
+    ids = [record_id for record_id, _ in chunk]
+    texts = [text for _, text in chunk]
+
+    try:
+        summaries = _summarizer.summarize_batch(texts, max_len=max_len, min_len=min_len)
+        results = [{"id": record_id, "summary": summary} for record_id, summary in zip(ids, summaries)]
+    except Exception:
+        # Retry one by one so a single bad note does not fail the whole chunk
+        results = []
+        for record_id, text in chunk:
+            try:
+                results.append({"id": record_id, "summary": _summarizer.summarize_text(text, max_len, min_len)})
+            except Exception as e:
+                results.append({"id": record_id, "error": str(e)})
+
+    return os.getpid(), time.perf_counter() - start, results
+
+
+def _core_sets(workers: int, threads: int) -> list:
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if len(available) < workers * threads:
+        return [None] * workers  # not enough cores to pin without overlap
+    return [set(available[i * threads:(i + 1) * threads]) for i in range(workers)]
+
+
+def main():
+    from app.runtime_config import load_runtime_config
+
+    cpu_count = os.cpu_count() or 1
+    tuned = load_runtime_config(profile="throughput")
+
+    parser = argparse.ArgumentParser(description="Bulk-summarize exported notes with checkpoint/resume")
+    parser.add_argument("input", type=Path, help=".jsonl or .csv file")
+    parser.add_argument("output", type=Path, help=".jsonl results file")
+    parser.add_argument("--text-field", default="input")
+    parser.add_argument("--id-field", default=None, help="defaults to the row number")
+    parser.add_argument("--workers", type=int, default=tuned.get("workers", max(1, cpu_count // 2)))
+    parser.add_argument("--threads", type=int, default=tuned.get("intra_op_threads"), help="torch threads per worker")
+    parser.add_argument("--chunk-size", type=int, default=tuned.get("batch_size", 8), help="notes per task and per checkpoint")
+    parser.add_argument("--max-length", type=int, default=120)
+    parser.add_argument("--min-length", type=int, default=30)
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, cpu_count // args.workers)
+    checkpoint_path = args.output.with_name(args.output.name + ".checkpoint.json")
+    checkpoint = load_checkpoint(checkpoint_path, args.input)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    out = args.output.open("a+b")
+    # Drop anything written after the last checkpoint (killed mid-chunk)
+    out.truncate(checkpoint["output_bytes"])
+    out.seek(checkpoint["output_bytes"])
+
+    print(f"=== Bulk summarize: {args.input} -> {args.output} ===")
+    print(f"{args.workers} workers x {threads} threads, resuming after {checkpoint['rows_done']} rows\n")
+
+    ctx = mp.get_context("spawn")
+    core_queue = ctx.Queue()
+    for cores in _core_sets(args.workers, threads):
+        core_queue.put(cores)
+
+    stats = {}  # pid -> [notes, busy seconds]
+    chunks = chunked(read_records(args.input, args.text_field, args.id_field), args.chunk_size, checkpoint["rows_done"])
+    started = time.perf_counter()
+    processed = 0
+
+    # ProcessPoolExecutor rather than multiprocessing.Pool: if a worker dies,
+    # Pool silently loses its task and waiting on it blocks forever, while
+    # the executor fails every pending future with BrokenProcessPool
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(threads, core_queue, args.max_length, args.min_length)
+        ) as pool:
+            # Bounded window of in-flight chunks; results are committed in input
+            # order so the checkpoint is a single row offset
+            pending = []
+            for chunk in chunks:
+                pending.append(pool.submit(_summarize_chunk, chunk))
+                if len(pending) >= 2 * args.workers:
+                    processed += _commit(pending.pop(0).result(), out, checkpoint, checkpoint_path, stats)
+            while pending:
+                processed += _commit(pending.pop(0).result(), out, checkpoint, checkpoint_path, stats)
+    except BrokenProcessPool:
+        out.close()
+        raise SystemExit(
+            f"A worker process died (out of memory?) after {checkpoint['rows_done']} rows were committed. "
+            "Re-run the same command to resume from the checkpoint."
+        )
+
+    out.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"\nDone: {processed} notes in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.2f} notes/sec overall)")
+    for pid, (notes, busy) in sorted(stats.items()):
+        print(f"  worker {pid}: {notes} notes, {notes / busy if busy else 0:.2f} notes/sec")
+    print(f"Total rows done: {checkpoint['rows_done']}")
+
+
+def _commit(result, out, checkpoint: dict, checkpoint_path: Path, stats: dict) -> int:
+    pid, busy, results = result
+    for row in results:
+        out.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+    out.flush()
+    os.fsync(out.fileno())
+
+    checkpoint["rows_done"] += len(results)
+    checkpoint["output_bytes"] = out.tell()
+    save_checkpoint(checkpoint_path, checkpoint)
+
+    worker = stats.setdefault(pid, [0, 0.0])
+    worker[0] += len(results)
+    worker[1] += busy
+    print(f"worker {pid}: {len(results)} notes in {busy:.2f}s ({len(results) / busy if busy else 0:.2f} notes/sec) "
+          f"- {checkpoint['rows_done']} rows done")
+    return len(results)
+
+
+if __name__ == "__main__":
+    main()
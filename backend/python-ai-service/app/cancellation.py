@@ -0,0 +1,159 @@
+"""
+cancellation.py - cooperative cancellation for model.generate()
+
+A CancelToken is created per request, with an optional deadline (off unless
+UZIMA_REQUEST_TIMEOUT or the request's timeout_seconds sets one). While generation runs
+in the worker pool, the handler polls for client disconnect and cancels the
+token, and answers as soon as the token is cancelled; CancellationCriteria
+checks it between decoder steps so beam search stops within one step. Work
+still queued when its token is cancelled is dropped before it starts.
+
+Counters (see CANCEL_STATS / GET /stats/cancellation) report cancelled work
+and an estimate of the compute time reclaimed, based on the average time of
+completed generations.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+# Default per-request deadline in seconds; unset means no deadline
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("UZIMA_REQUEST_TIMEOUT")) if os.getenv("UZIMA_REQUEST_TIMEOUT") else None
+DISCONNECT_POLL_SECONDS = 0.1
+
+# Generations allowed to run at once; the rest wait in the executor queue
+GENERATION_SLOTS = int(os.getenv("UZIMA_GENERATION_SLOTS", "1"))
+EXECUTOR = ThreadPoolExecutor(max_workers=GENERATION_SLOTS, thread_name_prefix="generate")
+
+
+class GenerationCancelled(Exception):
+    def __init__(self, reason: str):
+        super().__init__(f"Generation cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    def __init__(self, timeout: float = REQUEST_TIMEOUT_SECONDS):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline and time.monotonic() > self.deadline:
+            self.cancel("deadline_exceeded")
+        return self._event.is_set()
+
+
+class CancellationCriteria(StoppingCriteria):
+    """Stops every sequence in the batch once the token is cancelled."""
+
+    def __init__(self, token: CancelToken):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.token.cancelled(), dtype=torch.bool, device=input_ids.device)
+
+
+class CancellationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.dropped_before_start = 0
+        self.cancelled_during_generation = 0
+        self.cancelled_by_reason = {}
+        self.reclaimed_seconds_estimate = 0.0
+        self.average_generation_seconds = 0.0
+
+    def record_completed(self, seconds: float):
+        with self._lock:
+            self.completed += 1
+            # Running mean of full generations, used to estimate reclaimed time
+            self.average_generation_seconds += (seconds - self.average_generation_seconds) / self.completed
+
+    def record_dropped(self, reason: str):
+        with self._lock:
+            self.dropped_before_start += 1
+            self.cancelled_by_reason[reason] = self.cancelled_by_reason.get(reason, 0) + 1
+            self.reclaimed_seconds_estimate += self.average_generation_seconds
+
+    def record_cancelled(self, reason: str, seconds: float):
+        with self._lock:
+            self.cancelled_during_generation += 1
+            self.cancelled_by_reason[reason] = self.cancelled_by_reason.get(reason, 0) + 1
+            self.reclaimed_seconds_estimate += max(0.0, self.average_generation_seconds - seconds)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "completed": self.completed,
+                "dropped_before_start": self.dropped_before_start,
+                "cancelled_during_generation": self.cancelled_during_generation,
+                "cancelled_by_reason": dict(self.cancelled_by_reason),
+                "reclaimed_seconds_estimate": round(self.reclaimed_seconds_estimate, 3),
+                "average_generation_seconds": round(self.average_generation_seconds, 3),
+            }
+
+
+CANCEL_STATS = CancellationStats()
+
+
+def is_cancelled(stopping_criteria) -> bool:
+    """True if any CancellationCriteria in the list has been cancelled."""
+    return any(
+        isinstance(criteria, CancellationCriteria) and criteria.token.cancelled()
+        for criteria in stopping_criteria or []
+    )
+
+
+def _run(token: CancelToken, fn, args, kwargs):
+    if token.cancelled():
+        CANCEL_STATS.record_dropped(token.reason)
+        raise GenerationCancelled(token.reason)
+
+    start = time.perf_counter()
+    result = fn(*args, stopping_criteria=StoppingCriteriaList([CancellationCriteria(token)]), **kwargs)
+    elapsed = time.perf_counter() - start
+
+    # Only a cancel that happened during generation; a finished result stands
+    if token.reason:
+        CANCEL_STATS.record_cancelled(token.reason, elapsed)
+        raise GenerationCancelled(token.reason)
+
+    CANCEL_STATS.record_completed(elapsed)
+    return result
+
+
+async def run_cancellable(http_request, token: CancelToken, fn, *args, **kwargs):
+    """
+    Run fn(*args, stopping_criteria=..., **kwargs) in the generation pool,
+    cancelling the token if the client disconnects. Raises GenerationCancelled
+    as soon as the token is cancelled, even while the job is still queued.
+    """
+    future = asyncio.get_running_loop().run_in_executor(EXECUTOR, _run, token, fn, args, kwargs)
+
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return future.result()
+        if not token.cancelled() and await http_request.is_disconnected():
+            token.cancel("client_disconnected")
+        if token.cancelled():
+            # Don't wait for a slot: _run drops the job when it starts, or the
+            # running generate() stops at its next decoder step
+            future.add_done_callback(_discard_result)
+            raise GenerationCancelled(token.reason)
+
+
+def _discard_result(future):
+    # Retrieve the job's GenerationCancelled so asyncio does not log it as unhandled
+    future.exception()
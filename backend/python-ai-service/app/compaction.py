@@ -0,0 +1,192 @@
+"""
+compaction.py - deterministic input compaction before encoding
+
+Encoder cost and the 512-token limit both scale with input length, so notes
+are compacted before tokenization:
+  - whitespace runs collapsed, blank-line runs squeezed
+  - known boilerplate lines dropped (confidentiality notices, page footers,
+    print stamps, separator rules); a bare "Continued" only next to a page
+    footer, since on its own it can be a plan
+  - repeated labels ("Plan: Plan:") collapsed; a header dropped only when
+    the next line is another header or the note ends
+  - long copy-pasted lines or sentences dropped when they repeat inside the
+    same section (short ones such as "Paracetamol 1g" are always kept, since
+    a repeat may be a second dose). The same text under a different header,
+    or a repeated section such as a second identical set of vitals, is kept.
+  - verbose field labels and units mapped to the short forms the prompts and
+    training data already use ("Blood Pressure" -> "BP", "milligrams" -> "mg"),
+    labels only in label position and units only after a number
+
+Nothing with clinical content is removed: every sentence survives under the
+same header it had (see app/bench_compaction.py). A note that would compact
+to nothing is returned as posted.
+"""
+
+import os
+import re
+
+# Set UZIMA_COMPACT_INPUT=0 to send notes to the model as posted
+COMPACT_INPUT = os.getenv("UZIMA_COMPACT_INPUT", "1") != "0"
+
+# Lines/sentences this long that repeat verbatim within a section are copy-paste
+MIN_DEDUPE_LINE_CHARS = 30
+
+PAGE_FOOTER = re.compile(r'^page \d+( of \d+)?$', re.IGNORECASE)
+# "Continued" alone is only boilerplate next to a page footer
+PAGE_CONTINUED = re.compile(r'^\(?continued\)?\.?$', re.IGNORECASE)
+
+BOILERPLATE_PATTERNS = [PAGE_FOOTER] + [re.compile(p, re.IGNORECASE) for p in [
+    r'^[-=_*~#.]{3,}$',
+    r'^\(?continued on next page\)?\.?$',
+    r'^(this (document|report|record) is )?(strictly )?(private (and|&) )?confidential[.!]?$',
+    r'^confidential[:.-]? this (document|report|record|message) is intended (only|solely) for the '
+    r'(named )?(addressee|recipient)s?\.( unauthori[sz]ed (use|disclosure|copying) is (strictly )?prohibited\.)?$',
+    r'^(printed|generated|exported) (on|at) \d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}( \d{1,2}:\d{2}(:\d{2})?)?'
+    r'( by [\w .-]*\b(system|emr|his))?\.?$',
+    r'^\**\s*end of (report|document|note)\s*\**$',
+    r'^for (official|clinical) use only\.?$',
+]]
+
+# Longest first so "Systolic Blood Pressure" is not half-replaced
+LABELS = [
+    (r'blood pressure', 'BP'),
+    (r'heart rate|pulse rate', 'HR'),
+    (r'respiratory rate', 'RR'),
+    (r'oxygen saturation|sp\s?o₂', 'SpO2'),
+    (r'temperature', 'Temp'),
+    (r'presenting complaint', 'Chief Complaint'),
+    (r'management plan|plan of management|plan of care', 'Plan'),
+    (r'patient\'?s? full name|name of patient|patient name', 'Patient Name'),
+]
+# Only in label position - at the start of a line, or right before ":" or a
+# number - so "room temperature fluids" is left alone
+LABEL_PATTERNS = [
+    (re.compile(r'^(?:' + p + r')\b|\b(?:' + p + r')(?=\s*(?::|\d))', re.IGNORECASE), short) for p, short in LABELS
+]
+
+# Units only directly after a number, so ordinary words are left alone, and
+# not as part of a hyphenated word.
+# Third item is the separator the corpus uses ("500mg" but "118/76 mmHg")
+UNITS = [
+    (r'milligrams?', 'mg', ''),
+    (r'micrograms?', 'mcg', ''),
+    (r'kilograms?', 'kg', ''),
+    (r'grams?(?![- ]?(?:positive|negative|variable|stain))', 'g', ''),  # not "2 gram-positive cocci"
+    (r'millilit(?:re|er)s?', 'mL', ''),
+    (r'lit(?:re|er)s?', 'L', ''),
+    (r'per ?cent', '%', ''),
+    (r'beats per minute|beats/min', 'bpm', ' '),
+    (r'breaths per minute', 'breaths/min', ' '),
+    (r'degrees? (?:celsius|centigrade|c)|deg\.? ?c|° c', '°C', ''),
+    (r'millimet(?:re|er)s? of mercury|mm of hg|mm hg|mmhg', 'mmHg', ' '),
+]
+UNIT_PATTERNS = [
+    (re.compile(r'(\d)\s*(?:' + p + r')(?![A-Za-z-])', re.IGNORECASE), sep + short) for p, short, sep in UNITS
+]
+
+REPEATED_LABEL = re.compile(r'\b([A-Za-z][A-Za-z /]{1,40}):\s*(?:\1:\s*)+', re.IGNORECASE)
+# "None known:" / "Nil:" are values, not headers
+HEADER_LINE = re.compile(
+    r'^(?!(?:none|nil|no|not|nkda|nkfda|negative|normal|unknown)\b)[A-Za-z][A-Za-z /&()-]{1,40}:$', re.IGNORECASE
+)
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
+
+def _compact_line(line: str) -> str:
+    line = re.sub(r'[ \t ]+', ' ', line).strip()
+    for pattern, short in LABEL_PATTERNS:
+        line = pattern.sub(short, line)
+    for pattern, short in UNIT_PATTERNS:
+        line = pattern.sub(lambda m: m.group(1) + short, line)
+    line = REPEATED_LABEL.sub(lambda m: m.group(1) + ': ', line)
+    return line.strip()
+
+
+def _is_boilerplate(line: str) -> bool:
+    return any(pattern.match(line) for pattern in BOILERPLATE_PATTERNS)
+
+
+def compact_note(text: str) -> str:
+    """
+    Return the compacted note. Deterministic: the same input always gives
+    the same output.
+    """
+    raw_lines = [_compact_line(raw) for raw in text.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    lines = []
+    for i, line in enumerate(raw_lines):
+        if not line:
+            if lines and lines[-1]:
+                lines.append('')
+        elif not (_is_boilerplate(line) or _is_page_continued(raw_lines, i)):
+            lines.append(line)
+
+    # A header with no content of its own (next line is another header, or
+    # the note ends) carries nothing. Content after a blank line still counts.
+    lines = [
+        line for i, line in enumerate(lines)
+        if not (HEADER_LINE.match(line) and _is_header_or_end(_next_nonblank(lines, i)))
+    ]
+
+    # A section is a "Header:" line plus everything up to the next header.
+    # Long repeats are only dropped inside one section, so identical text
+    # under different headers (or a repeated reading) keeps its own label.
+    result = []
+    for section in _sections(lines):
+        seen = set()
+        for line in section:
+            kept = []
+            for sentence in SENTENCE_BREAK.split(line):
+                if len(sentence) >= MIN_DEDUPE_LINE_CHARS and sentence.lower() in seen:
+                    continue
+                seen.add(sentence.lower())
+                kept.append(sentence)
+            if kept:
+                result.append(' '.join(kept))
+
+    # Never hand the model an empty note for a non-empty one
+    return '\n'.join(result).strip() or text.strip()
+
+
+def _next_nonblank(lines: list, index: int):
+    for line in lines[index + 1:]:
+        if line:
+            return line
+    return None
+
+
+def _previous_nonblank(lines: list, index: int):
+    for line in reversed(lines[:index]):
+        if line:
+            return line
+    return None
+
+
+def _is_page_continued(lines: list, index: int) -> bool:
+    return bool(PAGE_CONTINUED.match(lines[index])) and any(
+        neighbour and PAGE_FOOTER.match(neighbour)
+        for neighbour in (_previous_nonblank(lines, index), _next_nonblank(lines, index))
+    )
+
+
+def _is_header_or_end(line) -> bool:
+    return line is None or bool(HEADER_LINE.match(line))
+
+
+def _sections(lines: list):
+    section = []
+    for line in lines:
+        if section and HEADER_LINE.match(line):
+            yield section
+            section = []
+        if line:
+            section.append(line)
+    if section:
+        yield section
+
+
+def compact_with_stats(text: str, tokenizer) -> tuple:
+    """Return (compacted text, tokens before, tokens after) for one note."""
+    compacted = compact_note(text)
+    before = len(tokenizer(text)["input_ids"])
+    after = len(tokenizer(compacted)["input_ids"]) if compacted != text else before
+    return compacted, before, after
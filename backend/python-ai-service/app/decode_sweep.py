@@ -0,0 +1,409 @@
+"""
+decode_sweep.py - offline quality-versus-latency sweep for decoding configs
+
+    python -m app.decode_sweep
+    python -m app.decode_sweep --samples 40 --min-rouge-l 0.35 --min-field-recall 0.8
+    python -m app.decode_sweep --models t5-small google/flan-t5-small@v5
+    python -m app.decode_sweep --models google/flan-t5-small+lora-fineTuner-google-flan-t5-small/models/flan-t5-small-lora-fast-10min
+
+Runs every (model, decoding config) pair over the labeled input/output pairs
+in data/train.jsonl and measures:
+  - ROUGE-1/2/L F1 against the flattened reference values
+  - field-level recall of vitals, medications and plan items
+  - mean/p95 latency and tokens generated per note
+
+Writes a JSON report plus a Markdown table of the Pareto frontier
+(lower latency vs. higher ROUGE-L / field recall), and names the cheapest
+config that meets the quality bar.
+
+A model spec is "<base model>[+<LoRA adapter dir>][@<prompt>]", where prompt
+is one of PROMPTS (default "summarize"). The current serving configs
+(BASELINES) are always scored with their own model and prompt.
+"""
+
+import argparse
+import importlib
+import itertools
+import json
+import re
+import statistics
+import time
+from pathlib import Path
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+DATA_FILE = Path("data/train.jsonl")
+OUTPUT_DIR = Path("reports")
+
+DEFAULT_MODELS = ["umeshramya/t5_small_medical_512"]
+
+
+def _v5():
+    """versions/v5.py loads flan-t5-small on import, so only import it when its prompts are used."""
+    return importlib.import_module("versions.v5")
+
+
+# How each serving path turns a note into model input
+PROMPTS = {
+    "summarize": lambda text: "summarize: " + text,
+    "v5": lambda text: _v5().TYPE_PROMPTS[_v5().detect_document_type(text)] + text.strip(),
+}
+
+# Values currently used across versions/v2.py-v6.py and app/medical_summarizer.py
+DEFAULT_GRID = {
+    "num_beams": [4, 5, 8],
+    "length_penalty": [1.3, 2.0],
+    "no_repeat_ngram_size": [0, 3],
+    "min_length": [30, 60, 140],
+    "max_length": [120, 280, 450],
+}
+
+# Configs in use today; always scored and listed in the report for comparison
+BASELINES = {
+    "medical_summarizer": {
+        "model": "umeshramya/t5_small_medical_512@summarize",
+        "config": {"num_beams": 4, "length_penalty": 2.0, "no_repeat_ngram_size": 0, "min_length": 30, "max_length": 120},
+    },
+    "v5_structured": {
+        "model": "google/flan-t5-small@v5",
+        "config": {"num_beams": 8, "length_penalty": 2.0, "no_repeat_ngram_size": 3, "min_length": 140, "max_length": 450},
+    },
+}
+
+MEDS_PATTERN = re.compile(r'(?:meds|medications)\s*:\s*([^.]+)', re.IGNORECASE)
+
+
+# ────────────────────────────────────────────────
+# Data
+# ────────────────────────────────────────────────
+def load_examples(path: Path, samples: int) -> list:
+    examples = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            examples.append({"input": row["input"], "reference": json.loads(row["output"])})
+            if len(examples) >= samples:
+                break
+    return examples
+
+
+def flatten_values(value) -> list:
+    """All leaf values of the reference JSON, as strings."""
+    if isinstance(value, dict):
+        return [v for item in value.values() for v in flatten_values(item)]
+    if isinstance(value, list):
+        return [v for item in value for v in flatten_values(item)]
+    return [str(value).replace("_", " ")]
+
+
+def expected_fields(example: dict) -> dict:
+    """
+    Field values the summary must keep. Vitals and plan come from the labeled
+    output; medications from the output if labeled, else from the input's
+    "meds:" / "medications:" list (the generated dataset does not label them).
+    """
+    reference = example["reference"]
+    fields = {
+        "vitals": [str(v) for v in reference.get("vitals", {}).values()],
+        "plan": [str(p) for p in reference.get("plan", [])],
+        "medications": [str(m) for m in reference.get("medications", [])],
+    }
+    if not fields["medications"]:
+        match = MEDS_PATTERN.search(example["input"])
+        if match:
+            fields["medications"] = [m.split()[0] for m in match.group(1).split(",") if m.strip()]
+    return fields
+
+
+# ────────────────────────────────────────────────
+# Metrics
+# ────────────────────────────────────────────────
+def _tokens(text: str) -> list:
+    return re.findall(r'[a-z0-9]+(?:[./][a-z0-9]+)*%?', text.lower())
+
+
+def _f1(overlap: int, pred_total: int, ref_total: int) -> float:
+    if not overlap or not pred_total or not ref_total:
+        return 0.0
+    precision = overlap / pred_total
+    recall = overlap / ref_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def _ngram_f1(pred: list, ref: list, n: int) -> float:
+    pred_ngrams = [tuple(pred[i:i + n]) for i in range(len(pred) - n + 1)]
+    ref_ngrams = [tuple(ref[i:i + n]) for i in range(len(ref) - n + 1)]
+    remaining = {}
+    for gram in ref_ngrams:
+        remaining[gram] = remaining.get(gram, 0) + 1
+    overlap = 0
+    for gram in pred_ngrams:
+        if remaining.get(gram):
+            remaining[gram] -= 1
+            overlap += 1
+    return _f1(overlap, len(pred_ngrams), len(ref_ngrams))
+
+
+def _lcs_length(a: list, b: list) -> int:
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def rouge_scores(prediction: str, reference: str) -> dict:
+    pred, ref = _tokens(prediction), _tokens(reference)
+    return {
+        "rouge1": _ngram_f1(pred, ref, 1),
+        "rouge2": _ngram_f1(pred, ref, 2),
+        "rougeL": _f1(_lcs_length(pred, ref), len(pred), len(ref)),
+    }
+
+
+def _contains(tokens: list, needle: list) -> bool:
+    n = len(needle)
+    return any(tokens[i:i + n] == needle for i in range(len(tokens) - n + 1))
+
+
+def field_hits(prediction: str, fields: dict) -> dict:
+    """
+    (found, expected) counts per field, matched case-insensitively on whole
+    tokens, so HR "80" is not found inside BP "120/80".
+    """
+    tokens = _tokens(prediction)
+    hits = {}
+    for name, values in fields.items():
+        found = sum(1 for v in values if _contains(tokens, _tokens(v)))
+        hits[name] = (found, len(values))
+    return hits
+
+
+# ────────────────────────────────────────────────
+# Generation
+# ────────────────────────────────────────────────
+def parse_spec(spec: str) -> tuple:
+    """Split "<model>[+<adapter>][@<prompt>]" into (model part, prompt name)."""
+    model_spec, _, prompt = spec.partition("@")
+    prompt = prompt or "summarize"
+    if prompt not in PROMPTS:
+        raise SystemExit(f"Unknown prompt '{prompt}' in {spec}. Available: {', '.join(PROMPTS)}")
+    return model_spec, prompt
+
+
+def _canonical(spec: str) -> str:
+    return "@".join(parse_spec(spec))
+
+
+def load_model(model_spec: str):
+    base, _, adapter = model_spec.partition("+")
+    tokenizer = AutoTokenizer.from_pretrained(adapter or base)
+    model = AutoModelForSeq2SeqLM.from_pretrained(base)
+    if adapter:
+        try:
+            from peft import PeftModel
+        except ImportError:
+            raise SystemExit("Evaluating a LoRA adapter needs `pip install peft`")
+        model = PeftModel.from_pretrained(model, adapter).merge_and_unload()
+    model.eval()
+    return tokenizer, model
+
+
+def generate(tokenizer, model, text: str, prompt: str, config: dict):
+    inputs = tokenizer(PROMPTS[prompt](text), return_tensors="pt", truncation=True, max_length=512)
+    start = time.perf_counter()
+    with torch.no_grad():
+        summary_ids = model.generate(**inputs, early_stopping=True, do_sample=False, **config)
+    latency = time.perf_counter() - start
+
+    generated = int((summary_ids[0] != tokenizer.pad_token_id).sum())
+    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True).strip()
+    return summary, latency, generated
+
+
+def evaluate(tokenizer, model, examples: list, prompt: str, config: dict) -> dict:
+    rouge = {"rouge1": [], "rouge2": [], "rougeL": []}
+    hits = {"vitals": [0, 0], "medications": [0, 0], "plan": [0, 0]}
+    latencies, generated_tokens = [], []
+
+    for example in examples:
+        summary, latency, generated = generate(tokenizer, model, example["input"], prompt, config)
+        latencies.append(latency)
+        generated_tokens.append(generated)
+
+        reference_text = " ".join(flatten_values(example["reference"]))
+        for key, score in rouge_scores(summary, reference_text).items():
+            rouge[key].append(score)
+        for name, (found, expected) in field_hits(summary, expected_fields(example)).items():
+            hits[name][0] += found
+            hits[name][1] += expected
+
+    latencies.sort()
+    found_total = sum(h[0] for h in hits.values())
+    expected_total = sum(h[1] for h in hits.values())
+    result = {key: round(statistics.mean(scores), 4) for key, scores in rouge.items()}
+    result.update({
+        f"recall_{name}": round(found / expected, 4) if expected else None
+        for name, (found, expected) in hits.items()
+    })
+    result.update({
+        "field_recall": round(found_total / expected_total, 4) if expected_total else 0.0,
+        "latency_mean_s": round(statistics.mean(latencies), 4),
+        "latency_p95_s": round(latencies[max(0, int(round(0.95 * len(latencies))) - 1)], 4),
+        "tokens_generated_mean": round(statistics.mean(generated_tokens), 1),
+    })
+    return result
+
+
+# ────────────────────────────────────────────────
+# Report
+# ────────────────────────────────────────────────
+def pareto_frontier(results: list) -> list:
+    """Results not dominated on (latency_mean_s low, rougeL high, field_recall high)."""
+    def dominates(a, b):
+        no_worse = (
+            a["latency_mean_s"] <= b["latency_mean_s"]
+            and a["rougeL"] >= b["rougeL"]
+            and a["field_recall"] >= b["field_recall"]
+        )
+        better = (
+            a["latency_mean_s"] < b["latency_mean_s"]
+            or a["rougeL"] > b["rougeL"]
+            or a["field_recall"] > b["field_recall"]
+        )
+        return no_worse and better
+
+    frontier = [r for r in results if not any(dominates(other, r) for other in results)]
+    return sorted(frontier, key=lambda r: r["latency_mean_s"])
+
+
+def cheapest_meeting_bar(results: list, min_rouge_l: float, min_field_recall: float):
+    passing = [r for r in results if r["rougeL"] >= min_rouge_l and r["field_recall"] >= min_field_recall]
+    return min(passing, key=lambda r: r["latency_mean_s"]) if passing else None
+
+
+TABLE_HEADER = [
+    "| model | baseline | beams | len_pen | no_repeat | min_len | max_len | ROUGE-1 | ROUGE-2 | ROUGE-L "
+    "| vitals | meds | plan | field recall | latency mean (s) | p95 (s) | tokens |",
+    "|---" * 17 + "|",
+]
+
+
+def _table_row(r: dict) -> str:
+    c = r["config"]
+    return (
+        f"| {r['model']} | {r['baseline'] or ''} | {c['num_beams']} | {c['length_penalty']} "
+        f"| {c['no_repeat_ngram_size']} | {c['min_length']} | {c['max_length']} | {r['rouge1']} | {r['rouge2']} "
+        f"| {r['rougeL']} | {r['recall_vitals']} | {r['recall_medications']} | {r['recall_plan']} "
+        f"| {r['field_recall']} | {r['latency_mean_s']} | {r['latency_p95_s']} | {r['tokens_generated_mean']} |"
+    )
+
+
+def _same_config(config: dict, other: dict) -> bool:
+    return all(config.get(key) == value for key, value in other.items())
+
+
+def _baseline_name(spec: str, config: dict):
+    for name, baseline in BASELINES.items():
+        if _canonical(spec) == _canonical(baseline["model"]) and _same_config(config, baseline["config"]):
+            return name
+    return None
+
+
+def markdown_report(results: list, frontier: list, choice, args) -> str:
+    lines = [
+        "# Decoding sweep - Pareto frontier",
+        "",
+        f"Quality bar: ROUGE-L >= {args.min_rouge_l}, field recall >= {args.min_field_recall}",
+        "",
+        *TABLE_HEADER,
+        *(_table_row(r) for r in frontier),
+        "",
+        "## Current serving configs",
+        "",
+        *TABLE_HEADER,
+        *(_table_row(r) for r in results if r["baseline"]),
+        "",
+    ]
+    if choice:
+        lines.append(f"**Cheapest config meeting the bar:** `{choice['model']}` with `{choice['config']}`")
+    else:
+        lines.append("**No config meets the quality bar.**")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quality-versus-latency sweep over decoding configs")
+    parser.add_argument("--data", type=Path, default=DATA_FILE)
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS, help="model specs, see above")
+    parser.add_argument("--grid", type=Path, help="JSON file overriding the default decoding grid")
+    parser.add_argument("--min-rouge-l", type=float, default=0.3)
+    parser.add_argument("--min-field-recall", type=float, default=0.8)
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with args.grid.open("r", encoding="utf-8") as f:
+            grid = {**DEFAULT_GRID, **json.load(f)}
+
+    examples = load_examples(args.data, args.samples)
+    keys = list(grid)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    # min_length above max_length is not a valid config
+    configs = [c for c in configs if c["min_length"] < c["max_length"]]
+
+    # Every requested model gets the full grid. The serving baselines are
+    # always scored on their own model and prompt, even with a custom --grid
+    # or --models.
+    runs = {_canonical(spec): list(configs) for spec in args.models}
+    for baseline in BASELINES.values():
+        spec_configs = runs.setdefault(_canonical(baseline["model"]), [])
+        if not any(_same_config(c, baseline["config"]) for c in spec_configs):
+            spec_configs.append(dict(baseline["config"]))
+
+    total = sum(len(spec_configs) for spec_configs in runs.values())
+    print(f"=== Decoding sweep: {len(runs)} models, {total} configs x {len(examples)} notes ===\n")
+
+    results, loaded = [], {}
+    for spec, spec_configs in runs.items():
+        model_spec, prompt = parse_spec(spec)
+        if model_spec not in loaded:
+            loaded[model_spec] = load_model(model_spec)
+        tokenizer, model = loaded[model_spec]
+        generate(tokenizer, model, examples[0]["input"], prompt, spec_configs[0])  # warm-up
+        for config in spec_configs:
+            result = {
+                "model": spec,
+                "config": config,
+                "baseline": _baseline_name(spec, config),
+                **evaluate(tokenizer, model, examples, prompt, config),
+            }
+            results.append(result)
+            print(
+                f"{spec} {config} -> ROUGE-L {result['rougeL']}, field recall {result['field_recall']}, "
+                f"{result['latency_mean_s']}s, {result['tokens_generated_mean']} tokens"
+            )
+
+    frontier = pareto_frontier(results)
+    choice = cheapest_meeting_bar(results, args.min_rouge_l, args.min_field_recall)
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    with (args.output_dir / "decode_sweep.json").open("w", encoding="utf-8") as f:
+        json.dump({"results": results, "frontier": frontier, "choice": choice}, f, indent=2)
+    with (args.output_dir / "decode_sweep.md").open("w", encoding="utf-8") as f:
+        f.write(markdown_report(results, frontier, choice, args))
+
+    print(f"\nPareto frontier: {len(frontier)} of {len(results)} configs")
+    print(f"Cheapest config meeting the bar: {choice['model'] + ' ' + str(choice['config']) if choice else 'none'}")
+    print(f"Saved to: {(args.output_dir / 'decode_sweep.md').absolute()}")
+
+
+if __name__ == "__main__":
+    main()
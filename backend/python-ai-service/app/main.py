@@ -1,6 +1,10 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from app.medical_summarizer import summarize_text
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from app.cancellation import CANCEL_STATS, CancelToken, GenerationCancelled, REQUEST_TIMEOUT_SECONDS, run_cancellable
+from app.compaction import COMPACT_INPUT, compact_with_stats
+from app.medical_summarizer import summarize_text, tokenizer
+from app.multi_view import VIEWS, summarize_views
 
 app = FastAPI(
     title="Uzimacare Medical Report Summarizer",
@@ -12,25 +16,78 @@ class SummaryRequest(BaseModel):
     text: str
     max_length: int = 120
     min_length: int = 30
+    timeout_seconds: Optional[float] = Field(None, gt=0)
 
 class SummaryResponse(BaseModel):
     summary: str
+    tokens_saved: int = 0
+
+class MultiViewRequest(BaseModel):
+    text: str
+    views: List[str] = ["bullets", "structured", "referral"]
+    timeout_seconds: Optional[float] = Field(None, gt=0)
+
+class MultiViewResponse(BaseModel):
+    views: Dict[str, str]
+    tokens_saved: int = 0
+
+def _cancelled_error(e: GenerationCancelled) -> HTTPException:
+    # 499 = client closed request (nginx convention); only ever seen in logs
+    if e.reason == "deadline_exceeded":
+        return HTTPException(status_code=504, detail="Summarization timed out")
+    return HTTPException(status_code=499, detail="Client disconnected")
+
+def _compact(text: str):
+    """Compacted text and tokens saved, measured with the bullet model's tokenizer."""
+    if not COMPACT_INPUT:
+        return text, 0
+    compacted, before, after = compact_with_stats(text, tokenizer)
+    return compacted, before - after
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/stats/cancellation")
+async def cancellation_stats():
+    return CANCEL_STATS.as_dict()
+
 @app.post("/summarize", response_model=SummaryResponse)
-async def summarize(request: SummaryRequest):
+async def summarize(request: SummaryRequest, http_request: Request):
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
     
+    text, tokens_saved = _compact(request.text)
+    token = CancelToken(request.timeout_seconds or REQUEST_TIMEOUT_SECONDS)
     try:
-        summary = summarize_text(
-            request.text,
+        summary = await run_cancellable(
+            http_request,
+            token,
+            summarize_text,
+            text,
             max_len=request.max_length,
             min_len=request.min_length
         )
-        return {"summary": summary}
+        return {"summary": summary, "tokens_saved": tokens_saved}
+    except GenerationCancelled as e:
+        raise _cancelled_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f" Summarization failed: {str(e)}")
+
+@app.post("/summarize/views", response_model=MultiViewResponse)
+async def summarize_multi_view(request: MultiViewRequest, http_request: Request):
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    unknown = [view for view in request.views if view not in VIEWS]
+    if not request.views or unknown:
+        raise HTTPException(status_code=400, detail=f"Views must be chosen from: {', '.join(VIEWS)}")
+
+    text, tokens_saved = _compact(request.text)
+    token = CancelToken(request.timeout_seconds or REQUEST_TIMEOUT_SECONDS)
+    try:
+        views = await run_cancellable(http_request, token, summarize_views, text, request.views)
+        return {"views": views, "tokens_saved": tokens_saved}
+    except GenerationCancelled as e:
+        raise _cancelled_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f" Summarization failed: {str(e)}")
\ No newline at end of file
@@ -1,18 +1,40 @@
+import os
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from app.runtime_config import RUNTIME_CONFIG, apply_torch_threads
 
-MODEL_NAME = "umeshramya/t5_small_medical_512"
+# UZIMA_MODEL can point at a local variant, e.g. the output of `python -m app.prune_vocab`
+MODEL_NAME = os.getenv("UZIMA_MODEL", "umeshramya/t5_small_medical_512")
+
+# Thread counts must be set before the model runs (see `python -m app.autotune`)
+apply_torch_threads(
+    RUNTIME_CONFIG.get("intra_op_threads"),
+    RUNTIME_CONFIG.get("inter_op_threads")
+)
 
 # Load model and tokenizer
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
 model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
 
-def summarize_text(text: str, max_len=120, min_len=30) -> str:
+def _to_bullets(summary: str) -> str:
+    # Convert to bullet points (original logic + strip)
+    points = [f"- {line.strip().capitalize()}" for line in summary.split('. ') if line.strip()]
+    return "\n".join(points) if points else "- No summary generated."
+
+def summarize_text(text: str, max_len=120, min_len=30, stopping_criteria=None) -> str:
     """
     Summarize input text into bullet points using medical-tuned T5-small.
     """
+    return summarize_batch([text], max_len=max_len, min_len=min_len, stopping_criteria=stopping_criteria)[0]
+
+def summarize_batch(texts: list, max_len=120, min_len=30, stopping_criteria=None) -> list:
+    """
+    Summarize several notes in one padded generate() call.
+    Same prompt, params and post-processing as summarize_text.
+    stopping_criteria lets callers cancel between decoder steps (app/cancellation.py).
+    """
     # Keep the prefix that gave cleaner results for your examples
-    input_text = "summarize: " + text
-    inputs = tokenizer(input_text, return_tensors="pt", truncation=True)
+    input_texts = ["summarize: " + text for text in texts]
+    inputs = tokenizer(input_texts, return_tensors="pt", truncation=True, padding=True)
 
     # Generate summary (original params)
     summary_ids = model.generate(
@@ -21,14 +43,12 @@ def summarize_text(text: str, max_len=120, min_len=30) -> str:
         min_length=min_len,
         length_penalty=2.0,
         num_beams=4,
-        early_stopping=True
+        early_stopping=True,
+        stopping_criteria=stopping_criteria
     )
 
-    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True).strip()
-
-    # Convert to bullet points (original logic + strip)
-    points = [f"- {line.strip().capitalize()}" for line in summary.split('. ') if line.strip()]
-    return "\n".join(points) if points else "- No summary generated."
+    summaries = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+    return [_to_bullets(summary.strip()) for summary in summaries]
 
 def main():
     print("=== Medical Summarizer (Preferred Version) ===")
@@ -48,4 +68,4 @@ def main():
         print("\n---\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
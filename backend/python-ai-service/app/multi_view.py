@@ -0,0 +1,128 @@
+"""
+multi_view.py - several summary views of one note from a single encoder pass
+
+Views:
+  - bullets:    bullet summary (app/medical_summarizer.py)
+  - brief:      shorter bullet summary, same model and prompt as bullets
+  - structured: bold-section summary by document type (versions/v5.py)
+  - referral:   referral extract (versions/v5.py referral prompt)
+
+For each model, the distinct prompts of the requested views are encoded
+together in one padded batch, so views with the same prompt share one
+encoder pass. The decoder then runs once per group of views with the same
+generation params, batched over their prompts, reusing those hidden states.
+"""
+
+import importlib
+
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+
+from app import medical_summarizer
+from app.cancellation import is_cancelled
+from app.medical_summarizer import _to_bullets
+
+
+def _v5():
+    """
+    versions/v5.py loads google/flan-t5-small on import, so it is only
+    imported on the first structured/referral request, not per worker at startup.
+    """
+    return importlib.import_module("versions.v5")
+
+
+MODELS = {
+    "medical": lambda: (medical_summarizer.tokenizer, medical_summarizer.model),
+    "flan": lambda: (_v5().tokenizer, _v5().model),
+}
+
+BULLET_PARAMS = {"max_length": 120, "min_length": 30, "length_penalty": 2.0, "num_beams": 4, "early_stopping": True}
+BRIEF_PARAMS = {"max_length": 60, "min_length": 10, "length_penalty": 2.0, "num_beams": 4, "early_stopping": True}
+STRUCTURED_PARAMS = {
+    "max_length": 450,
+    "min_length": 140,
+    "length_penalty": 2.0,
+    "num_beams": 8,
+    "early_stopping": True,
+    "no_repeat_ngram_size": 3,
+    "do_sample": False,
+}
+
+VIEWS = {
+    "bullets": {
+        "model": "medical",
+        "prompt": lambda text: "summarize: " + text,
+        "params": BULLET_PARAMS,
+        "format": lambda decoded, text: _to_bullets(decoded),
+    },
+    "brief": {
+        "model": "medical",
+        "prompt": lambda text: "summarize: " + text,
+        "params": BRIEF_PARAMS,
+        "format": lambda decoded, text: _to_bullets(decoded),
+    },
+    "structured": {
+        "model": "flan",
+        "prompt": lambda text: _v5().TYPE_PROMPTS[_v5().detect_document_type(text)] + text.strip(),
+        "params": STRUCTURED_PARAMS,
+        "format": lambda decoded, text: _v5().format_structured_output(decoded, _v5().detect_document_type(text)),
+    },
+    "referral": {
+        "model": "flan",
+        "prompt": lambda text: _v5().TYPE_PROMPTS["referral_note"] + text.strip(),
+        "params": STRUCTURED_PARAMS,
+        "format": lambda decoded, text: _v5().format_structured_output(decoded, "referral_note"),
+    },
+}
+
+
+def summarize_views(text: str, views: list, stopping_criteria=None) -> dict:
+    """
+    Return {view: summary} for the requested views, in request order.
+    stopping_criteria is applied to every decode (see app/cancellation.py);
+    once it is cancelled no further encoder pass or decode starts, and the
+    views done so far are returned for the caller to discard.
+    """
+    unknown = [view for view in views if view not in VIEWS]
+    if unknown:
+        raise ValueError(f"Unknown views: {', '.join(unknown)}. Available: {', '.join(VIEWS)}")
+
+    views = list(dict.fromkeys(views))
+    results = {}
+
+    for model_key in dict.fromkeys(VIEWS[view]["model"] for view in views):
+        if is_cancelled(stopping_criteria):
+            return results
+        tokenizer, model = MODELS[model_key]()
+        model_views = [view for view in views if VIEWS[view]["model"] == model_key]
+
+        # One row per distinct prompt; views with the same prompt share the row
+        prompts = list(dict.fromkeys(VIEWS[view]["prompt"](text) for view in model_views))
+        row_of = {view: prompts.index(VIEWS[view]["prompt"](text)) for view in model_views}
+
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=512)
+        with torch.no_grad():
+            hidden = model.get_encoder()(**inputs, return_dict=True).last_hidden_state
+
+        # One batched decode per set of generation params
+        groups = {}
+        for view in model_views:
+            groups.setdefault(tuple(sorted(VIEWS[view]["params"].items())), []).append(view)
+
+        for params, group in groups.items():
+            if is_cancelled(stopping_criteria):
+                return results
+            rows = sorted({row_of[view] for view in group})
+            index = torch.tensor(rows)
+            with torch.no_grad():
+                summary_ids = model.generate(
+                    encoder_outputs=BaseModelOutput(last_hidden_state=hidden[index]),
+                    attention_mask=inputs["attention_mask"][index],
+                    stopping_criteria=stopping_criteria,
+                    **dict(params)
+                )
+            decoded = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+            for view in group:
+                results[view] = VIEWS[view]["format"](decoded[rows.index(row_of[view])].strip(), text)
+
+    return {view: results[view] for view in views}
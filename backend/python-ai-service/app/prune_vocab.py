@@ -0,0 +1,229 @@
+"""
+prune_vocab.py - medical-domain vocabulary pruning for T5 models
+
+    python -m app.prune_vocab
+    python -m app.prune_vocab --model google/flan-t5-small --output models/flan-t5-small-pruned
+    UZIMA_MODEL=models/t5-small-medical-pruned python -m app.serve
+
+T5-small / flan-t5-small carry a 32k vocabulary, but the shared embedding and
+LM head are computed over all of it on every decoder step. This tool:
+  1. counts the token ids our corpus uses (note inputs, labeled outputs and
+     the model's own summaries of the notes, so decoder tokens are covered)
+  2. keeps only those ids (plus pad/eos/unk) and writes a matching tokenizer
+  3. slices the embedding and LM-head rows into a smaller model
+  4. checks the pruned model gives identical summaries on held-out notes,
+     and only then moves it to --output
+
+T5 uses a Unigram tokenizer, so any text whose original segmentation only
+uses kept pieces is segmented the same way by the pruned tokenizer.
+"""
+
+import argparse
+import json
+import random
+import shutil
+import time
+from collections import Counter
+from pathlib import Path
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, T5TokenizerFast
+
+DATA_FILE = Path("data/train.jsonl")
+MODEL_NAME = "umeshramya/t5_small_medical_512"
+OUTPUT_DIR = Path("models/t5-small-medical-pruned")
+PREFIX = "summarize: "
+
+# Same decoding as app/medical_summarizer.py, so verification matches serving
+GENERATION_PARAMS = {
+    "max_length": 120,
+    "min_length": 30,
+    "length_penalty": 2.0,
+    "num_beams": 4,
+    "early_stopping": True,
+}
+
+
+def load_texts(path: Path) -> list:
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(tokenizer, model, text: str):
+    inputs = tokenizer(PREFIX + text, return_tensors="pt", truncation=True)
+    with torch.no_grad():
+        return model.generate(**inputs, **GENERATION_PARAMS)[0]
+
+
+# ────────────────────────────────────────────────
+# 1. Token usage
+# ────────────────────────────────────────────────
+def count_token_usage(tokenizer, model, rows: list) -> Counter:
+    usage = Counter()
+    for row in rows:
+        usage.update(tokenizer(PREFIX + row["input"])["input_ids"])
+        usage.update(tokenizer(row["output"])["input_ids"])
+        usage.update(summarize(tokenizer, model, row["input"]).tolist())
+    return usage
+
+
+# ────────────────────────────────────────────────
+# 2. Tokenizer
+# ────────────────────────────────────────────────
+def prune_tokenizer(tokenizer, keep_ids: list, output_dir: Path):
+    """Write a fast tokenizer whose id i is the original id keep_ids[i]."""
+    old_to_new = {old: new for new, old in enumerate(keep_ids)}
+    spec = json.loads(tokenizer.backend_tokenizer.to_str())
+
+    if spec["model"]["type"] != "Unigram":
+        raise SystemExit(f"Only Unigram (T5) tokenizers are supported, got {spec['model']['type']}")
+
+    vocab = spec["model"]["vocab"]
+    spec["model"]["vocab"] = [vocab[old] for old in keep_ids]
+    spec["model"]["unk_id"] = old_to_new[spec["model"]["unk_id"]]
+    spec["added_tokens"] = [
+        {**token, "id": old_to_new[token["id"]]}
+        for token in spec["added_tokens"] if token["id"] in old_to_new
+    ]
+    for token in (spec.get("post_processor") or {}).get("special_tokens", {}).values():
+        token["ids"] = [old_to_new[i] for i in token["ids"]]
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer_file = output_dir / "tokenizer.json"
+    with tokenizer_file.open("w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False)
+
+    # extra_ids=0: the <extra_id_*> sentinels are only needed for pre-training
+    pruned = T5TokenizerFast(
+        tokenizer_file=str(tokenizer_file),
+        extra_ids=0,
+        model_max_length=tokenizer.model_max_length
+    )
+    pruned.save_pretrained(output_dir)
+    return pruned
+
+
+# ────────────────────────────────────────────────
+# 3. Model
+# ────────────────────────────────────────────────
+def prune_model(model, keep_ids: list):
+    index = torch.tensor(keep_ids)
+    embedding = model.get_input_embeddings().weight.data[index].clone()
+    lm_head = model.get_output_embeddings().weight.data[index].clone()
+
+    model.set_input_embeddings(torch.nn.Embedding.from_pretrained(embedding, freeze=False))
+    new_head = torch.nn.Linear(lm_head.shape[1], lm_head.shape[0], bias=False)
+    new_head.weight.data = lm_head
+    model.set_output_embeddings(new_head)
+
+    model.config.vocab_size = len(keep_ids)
+    if model.config.tie_word_embeddings:
+        model.tie_weights()
+    return model
+
+
+# ────────────────────────────────────────────────
+# 4. Verification
+# ────────────────────────────────────────────────
+def verify(original, pruned, rows: list) -> dict:
+    """Compare decoded summaries and generate() time on held-out notes."""
+    identical, mismatches = 0, []
+    original_time = pruned_time = 0.0
+
+    for row in rows:
+        start = time.perf_counter()
+        expected = original[0].decode(summarize(*original, row["input"]), skip_special_tokens=True)
+        original_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = pruned[0].decode(summarize(*pruned, row["input"]), skip_special_tokens=True)
+        pruned_time += time.perf_counter() - start
+
+        if expected == actual:
+            identical += 1
+        else:
+            mismatches.append({"input": row["input"], "original": expected, "pruned": actual})
+
+    return {
+        "held_out": len(rows),
+        "identical": identical,
+        "mismatches": mismatches,
+        "original_seconds": round(original_time, 3),
+        "pruned_seconds": round(pruned_time, 3),
+    }
+
+
+def _parameter_count(model) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune a T5 vocabulary to the tokens our notes use")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--data", type=Path, default=DATA_FILE)
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction of notes kept for verification")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = load_texts(args.data)
+    random.Random(args.seed).shuffle(rows)
+    split = int(len(rows) * (1 - args.holdout))
+    train_rows, held_out_rows = rows[:split], rows[split:]
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForSeq2SeqLM.from_pretrained(args.model).eval()
+    original_vocab = model.config.vocab_size
+    original_params = _parameter_count(model)
+
+    print(f"=== Vocabulary pruning: {args.model} ===")
+    print(f"Counting token usage over {len(train_rows)} notes...")
+    usage = count_token_usage(tokenizer, model, train_rows)
+
+    special_ids = {tokenizer.pad_token_id, tokenizer.eos_token_id, tokenizer.unk_token_id}
+    # Ids past len(tokenizer) are padding rows of the embedding with no token
+    keep_ids = sorted(i for i in set(usage) | special_ids if i < len(tokenizer))
+    print(f"Keeping {len(keep_ids)} of {original_vocab} tokens")
+
+    # Build in a staging dir and verify what was written there; only a variant
+    # that matches on every held-out note is moved to --output
+    staging = args.output.with_name(args.output.name + ".staging")
+    shutil.rmtree(staging, ignore_errors=True)
+    prune_tokenizer(tokenizer, keep_ids, staging)
+    prune_model(AutoModelForSeq2SeqLM.from_pretrained(args.model), keep_ids).save_pretrained(staging)
+    with (staging / "vocab_map.json").open("w", encoding="utf-8") as f:
+        json.dump({"source_model": args.model, "kept_original_ids": keep_ids}, f)
+
+    pruned_tokenizer = AutoTokenizer.from_pretrained(staging)
+    pruned_model = AutoModelForSeq2SeqLM.from_pretrained(staging).eval()
+
+    print(f"Verifying on {len(held_out_rows)} held-out notes...")
+    report = verify((tokenizer, model), (pruned_tokenizer, pruned_model), held_out_rows)
+    report.update({
+        "source_model": args.model,
+        "original_vocab": original_vocab,
+        "pruned_vocab": len(keep_ids),
+        "original_parameters": original_params,
+        "pruned_parameters": _parameter_count(pruned_model),
+    })
+
+    print(f"\nParameters: {original_params:,} -> {report['pruned_parameters']:,}")
+    print(f"Held-out generate time: {report['original_seconds']}s -> {report['pruned_seconds']}s")
+    print(f"Identical outputs: {report['identical']}/{report['held_out']}")
+
+    if report["mismatches"]:
+        shutil.rmtree(staging)
+        report_file = args.output.with_name(args.output.name + ".failed_report.json")
+        with report_file.open("w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        raise SystemExit(f"Pruned model differs on held-out notes - nothing saved, see {report_file} "
+                         "(add more notes to the corpus and re-run)")
+
+    with (staging / "pruning_report.json").open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    shutil.rmtree(args.output, ignore_errors=True)
+    staging.rename(args.output)
+    print(f"Saved to: {args.output.absolute()}")
+
+if __name__ == "__main__":
+    main()
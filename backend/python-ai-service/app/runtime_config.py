@@ -0,0 +1,52 @@
+"""
+runtime_config.py - machine-specific runtime settings
+
+Loads the config written by `python -m app.autotune` and applies the torch
+thread counts before the model is loaded. If no config file exists the library
+defaults are kept, so the service still starts on a fresh machine.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import torch
+
+# Set UZIMA_RUNTIME_CONFIG="" to ignore the file (the autotuner does this)
+CONFIG_FILE = os.getenv("UZIMA_RUNTIME_CONFIG", "config/runtime.json")
+DEFAULT_PROFILE = "latency"  # the API serves one note per request
+
+
+def load_runtime_config(path: str = CONFIG_FILE, profile: str = None) -> dict:
+    """
+    Return the settings for one profile ("throughput" or "latency"), or {} if
+    the file has not been generated yet.
+    """
+    if not path or not Path(path).is_file():
+        return {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    profile = profile or os.getenv("UZIMA_RUNTIME_PROFILE") or config.get("default_profile", DEFAULT_PROFILE)
+    if profile not in config:
+        raise ValueError(f"Runtime profile '{profile}' not found in {path}")
+    return config[profile]
+
+
+def apply_torch_threads(intra_op_threads: int = None, inter_op_threads: int = None):
+    """
+    Set torch thread pools. Must run before the first forward pass, because
+    torch refuses to resize the inter-op pool once it has been used.
+    """
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # Pool already started (e.g. another module ran torch first) - keep it
+            pass
+
+
+RUNTIME_CONFIG = load_runtime_config()
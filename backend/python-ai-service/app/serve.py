@@ -0,0 +1,22 @@
+"""
+serve.py - start the API with the autotuned worker count
+
+    python -m app.serve
+
+Workers come from config/runtime.json (profile picked by UZIMA_RUNTIME_PROFILE);
+each worker applies the thread counts itself when app.medical_summarizer loads.
+"""
+
+import os
+
+import uvicorn
+
+from app.runtime_config import RUNTIME_CONFIG
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=RUNTIME_CONFIG.get("workers", 1)
+    )
@@ -85,7 +85,9 @@ def generate_structured_summary(raw_text: str, max_length: int = 450, min_length
     )
 
     decoded = tokenizer.decode(summary_ids[0], skip_special_tokens=True).strip()
+    return format_structured_output(decoded, doc_type)
 
+def format_structured_output(decoded: str, doc_type: str) -> str:
     # Aggressive cleanup
     decoded = decoded.replace("Complete the structured summary without truncation for this input:", "").strip()
     decoded = re.sub(r'Output\s*:?\s*', '', decoded, flags=re.IGNORECASE)